@@ -1,50 +1,32 @@
-import re, json
-from typing import List
-from pydantic import BaseModel, ValidationError
-
-class Question(BaseModel):
-    question: str
-    choices: List[str]
-    correctIndex: int
-    explanation: str
-
-class Quiz(BaseModel):
-    title: str
-    instructions: str
-    questions: List[Question]
-
-def extract_json_block(text: str) -> str:
-    """Strip code fences and return the substring between the first '{' and last '}'."""
-    if not text:
-        raise ValueError("Empty model output.")
-    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip(), flags=re.S)
-    start = cleaned.find("{")
-    end = cleaned.rfind("}")
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError("Could not find JSON object in the output.")
-    return cleaned[start:end+1]
-
-import json
+import io
+import httpx
+import orjson
 import streamlit as st
-from openai import OpenAI
-from composio import Composio
+from openai import APITimeoutError
+from openai.types.chat import ChatCompletion
+from pydantic import ValidationError
+
+from common import (
+    QUIZ_RESPONSE_FORMAT,
+    Quiz,
+    dumps_json,
+    email_tool_messages,
+    extract_json_block,
+    get_clients,
+    quiz_to_text,
+    render_json,
+)
 
 # ---------- Page setup ----------
 st.set_page_config(page_title="Quiz + Email via Composio", page_icon="🧩", layout="wide")
 st.title("🧩 Quiz Generator + 📧 Email Sender (Composio + OpenAI)")
 
 # ---------- Secrets / Clients ----------
-@st.cache_resource
-def _get_clients():
-    try:
-        openai_key = st.secrets["OPENAI_API_KEY"]
-        composio_key = st.secrets["COMPOSIO_API_KEY"]
-    except KeyError as e:
-        st.error(f"Missing secret: {e}. Add it to .streamlit/secrets.toml and restart.")
-        st.stop()
-    return OpenAI(base_url="https://api.aimlapi.com/v1",api_key=openai_key), Composio(api_key=composio_key)
+client, composio, pool = get_clients()
 
-client, composio = _get_clients()
+@st.cache_data(ttl=600, show_spinner=False)
+def _get_gmail_tool(user_id: str):
+    return composio.tools.get(user_id=user_id, tools=["GMAIL_SEND_EMAIL"])
 
 # ---------- Session defaults ----------
 ss = st.session_state
@@ -54,6 +36,16 @@ ss.setdefault("redirect_url", None)
 ss.setdefault("quiz_json", None)
 ss.setdefault("quiz_text", "")
 ss.setdefault("quiz_meta", {"topic": "", "difficulty": "", "count": 0})
+ss.setdefault("json_repair_count", 0)
+ss.setdefault("default_subject", "Quiz: (no topic) — ")
+ss.setdefault("body_prefill", "Generate a quiz first, then come back here.")
+ss.setdefault("tools_future", None)
+ss.setdefault("tools_future_user", None)
+ss.setdefault("tools_cache", {})
+ss.setdefault("send_future", None)
+ss.setdefault("send_label", "")
+ss.setdefault("send_notified", True)
+ss.setdefault("send_diagnostics", {})
 
 # ---------- Sidebar: Composio auth ----------
 with st.sidebar:
@@ -95,51 +87,145 @@ with st.sidebar:
         st.info("After authorizing, return here and click **I finished OAuth**.")
 
     if finish_oauth:
-        if not ss.connection_request:
+        if ss.connected_account and ss.connected_account["user_id"] == user_id:
+            # Already confirmed in this session; no need to poll Composio again
+            st.success("✅ Already connected.")
+        elif not ss.connection_request:
             st.warning("Start OAuth first.")
         else:
             with st.spinner("Waiting for Composio to confirm the connection..."):
                 try:
                     connected = ss.connection_request.wait_for_connection()
-                    ss.connected_account = connected
+                    # Keep only the identity reruns need, not the live request objects
+                    ss.connected_account = {
+                        "id": getattr(connected, "id", None),
+                        "user_id": user_id,
+                        "status": getattr(connected, "status", None),
+                    }
+                    ss.connection_request = None
+                    ss.redirect_url = None
+                    # Prefetch the Gmail tool schema so Send doesn't wait on it
+                    ss.tools_future = pool.submit(composio.tools.get, user_id=user_id, tools=["GMAIL_SEND_EMAIL"])
+                    ss.tools_future_user = user_id
                     st.success("✅ Connected! Gmail tool is available.")
                 except Exception as e:
                     st.error(f"Failed to confirm connection: {e}")
 
+    debug = st.checkbox("Debug payloads", value=False, help="Show raw tool, model and execution payloads.")
+
+    if st.button("🔄 Refresh tools"):
+        _get_gmail_tool.clear()
+        ss.tools_future = None
+        ss.tools_cache = {}
+        st.toast("Tool schema cache cleared.")
+
     st.divider()
     st.caption("Tips:\n- Keep this window open during OAuth\n- Make sure the Gmail tool is configured in Composio")
 
 # ---------- Helpers ----------
-def render_json(label, data):
-    with st.expander(label, expanded=False):
-        try:
-            st.code(json.dumps(data, indent=2), language="json")
-        except TypeError:
-            st.write(data)
-
-def quiz_to_text(quiz_obj: dict) -> str:
-    lines = []
-    title = quiz_obj.get("title", "Quiz")
-    instructions = quiz_obj.get("instructions", "")
-    lines.append(title)
-    if instructions:
-        lines.append(instructions)
-    lines.append("")
-
-    for i, q in enumerate(quiz_obj.get("questions", []), start=1):
-        lines.append(f"{i}. {q.get('question','')}")
-        choices = q.get("choices", [])
-        for idx, ch in enumerate(choices, start=1):
-            lines.append(f"   {chr(64+idx)}. {ch}")  # A., B., C., ...
-        # Show answer as well:
-        ci = q.get("correctIndex", None)
-        if isinstance(ci, int) and 0 <= ci < len(choices):
-            lines.append(f"   ✅ Answer: {chr(65+ci)}")
-        expl = q.get("explanation", "")
-        if expl:
-            lines.append(f"   ℹ️  {expl}")
-        lines.append("")
-    return "\n".join(lines)
+@st.fragment(run_every=2)
+def _send_pending():
+    """Poll the in-flight Gmail send; once it finishes, rerun the app so polling stops."""
+    if ss.send_future is None or ss.send_future.done():
+        st.rerun()
+    st.info("📤 Sending email in the background...")
+
+def _send_status():
+    """Report the background Gmail send: poll while it runs, then show its outcome."""
+    fut = ss.send_future
+    if fut is None:
+        return
+    if not fut.done():
+        _send_pending()
+        return
+    try:
+        result = fut.result()
+    except Exception as e:
+        st.error(f"Tool execution failed: {e}")
+        for label, payload in ss.send_diagnostics.items():
+            render_json(label, payload, key=f"send_{label}")
+        note = "❌ Email send failed."
+    else:
+        st.success(f"✅ {ss.send_label}")
+        if debug:
+            render_json("Execution Result", result, key="send_result")
+        note = f"✅ {ss.send_label}"
+    if not ss.send_notified:
+        ss.send_notified = True
+        st.toast(note)
+
+@st.cache_data(show_spinner=False)
+def _quiz_to_text_cached(quiz_json_str: str) -> str:
+    return quiz_to_text(orjson.loads(quiz_json_str))
+
+@st.cache_data(show_spinner=False)
+def _quiz_json_pretty(quiz_json_str: str) -> str:
+    return dumps_json(orjson.loads(quiz_json_str))
+
+def stream_completion(placeholder, status=None, **kwargs) -> ChatCompletion:
+    """Stream a chat completion into `placeholder` and reassemble it as a ChatCompletion.
+
+    Content deltas are shown as they arrive; tool-call deltas are accumulated by
+    index (id/name once, arguments as concatenated fragments) per the streaming protocol.
+    If an `st.status` container is given, its label tracks the tool call being planned.
+
+    The SDK's max_retries only covers opening the stream, so a request that times
+    out, including one that stalls mid-stream, is restarted here once.
+    """
+    try:
+        return _stream_completion_once(placeholder, status, **kwargs)
+    except (APITimeoutError, httpx.ReadTimeout):
+        # Drop the stalled attempt's partial output before starting over
+        placeholder.empty()
+        if status is not None:
+            status.update(label="Timed out; retrying once...")
+        return _stream_completion_once(placeholder, status, **kwargs)
+
+def _stream_completion_once(placeholder, status=None, **kwargs) -> ChatCompletion:
+    stream = client.chat.completions.create(stream=True, **kwargs)
+    buf = io.StringIO()
+    tool_calls = {}
+    resp_id, model, created, finish_reason = "", kwargs.get("model", ""), 0, None
+    for chunk in stream:
+        resp_id = resp_id or chunk.id
+        model = chunk.model or model
+        created = created or chunk.created
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        finish_reason = choice.finish_reason or finish_reason
+        delta = choice.delta
+        if delta.content:
+            buf.write(delta.content)
+            placeholder.code(buf.getvalue(), language="json")
+        for tc in delta.tool_calls or []:
+            if status is not None and tc.index not in tool_calls and tc.function and tc.function.name:
+                status.update(label=f"Planning {tc.function.name} call...")
+            slot = tool_calls.setdefault(
+                tc.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}}
+            )
+            if tc.id:
+                slot["id"] = tc.id
+            if tc.function:
+                if tc.function.name:
+                    slot["function"]["name"] += tc.function.name
+                if tc.function.arguments:
+                    slot["function"]["arguments"] += tc.function.arguments
+
+    message = {"role": "assistant", "content": buf.getvalue() or None}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
+    return ChatCompletion.model_validate({
+        "id": resp_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": finish_reason or ("tool_calls" if tool_calls else "stop"),
+            "message": message,
+        }],
+    })
 
 # ---------- Main: 1) Generate quiz ----------
 st.header("1) Generate a Quiz with LLM")
@@ -182,67 +268,78 @@ if gen_btn:
             "content": f"Topic: {topic}\nDifficulty: {difficulty}\nNumber of questions: {count}\n"
         }
 
-        with st.spinner("Generating quiz with LLM..."):
+        with st.spinner("Generating quiz with LLM (retrying once on timeout)..."):
             last_err = None
             quiz_obj = None
-            # Try up to 2 times: first with strict JSON enforcement, then fallback
-            for attempt in range(2):
-                try:
-                    resp = client.chat.completions.create(
-                        model="openai/gpt-5-chat-latest",
-                        messages=[sys, usr],
-                        temperature=0,
-                        response_format={"type": "json_object"},  # hard-enforce JSON
-                    )
-                except Exception as e:
-                    st.error(f"OpenAI API error: {e}")
-                    break
-
+            raw = ""
+            stream_box = st.empty()
+            try:
+                resp = stream_completion(
+                    stream_box,
+                    model="openai/gpt-5-chat-latest",
+                    messages=[sys, usr],
+                    temperature=0,
+                    response_format=QUIZ_RESPONSE_FORMAT,
+                )
                 raw = resp.choices[0].message.content or ""
+            except Exception as e:
+                st.error(f"OpenAI API error: {e}")
 
-                # Parse -> validate
+            # Parse -> validate; extract_json_block is only a last-ditch fallback
+            if raw:
                 try:
                     try:
-                        data = json.loads(raw)
-                    except json.JSONDecodeError:
-                        data = json.loads(extract_json_block(raw))
+                        data = orjson.loads(raw)
+                    except orjson.JSONDecodeError:
+                        # The provider ignored the schema; count it to monitor compliance
+                        ss.json_repair_count += 1
+                        data = orjson.loads(extract_json_block(raw))
 
                     # Validate shape
                     quiz_valid = Quiz.model_validate(data)
                     quiz_obj = quiz_valid.model_dump()
-                    break  # success
-                except (json.JSONDecodeError, ValidationError, ValueError) as e:
+                except (orjson.JSONDecodeError, ValidationError, ValueError) as e:
                     last_err = e
-                    # On second failure, give up
-                    if attempt == 1:
-                        pass
+                if debug:
+                    st.caption(f"JSON repairs this session: {ss.json_repair_count}")
 
+            stream_box.empty()
             if not quiz_obj:
                 st.error("The model did not return valid JSON. I tried to coerce it but failed.")
                 st.caption(f"Parser note: {last_err}")
                 st.text_area("Raw model output", raw, height=240)
             else:
                 ss.quiz_json = quiz_obj
-                # your existing quiz_to_text() is fine:
-                ss.quiz_text = quiz_to_text(quiz_obj)
+                # Keyed on the compact JSON so an identical quiz skips formatting
+                quiz_json_str = orjson.dumps(quiz_obj).decode()
+                ss.quiz_text = _quiz_to_text_cached(quiz_json_str)
                 ss.quiz_meta = {"topic": topic, "difficulty": difficulty, "count": int(count)}
+                # Email defaults only change with the quiz, not on every rerun
+                ss.default_subject = f"Quiz: {topic} — {difficulty}"
+                ss.body_prefill = ss.quiz_text
                 st.success("✅ Quiz generated!")
                 st.text_area("Preview (plain text)", ss.quiz_text, height=300)
                 with st.expander("Quiz JSON"):
-                    st.code(json.dumps(quiz_obj, indent=2), language="json")
+                    st.code(_quiz_json_pretty(quiz_json_str), language="json")
 
 # ---------- Main: 2) Email the quiz via Composio Gmail tool ----------
 st.header("2) Email the Generated Quiz")
 
 to_email = st.text_input("Recipient email", value="", placeholder="recipient@example.com")
-default_subject = f"Quiz: {ss.quiz_meta.get('topic','(no topic)')} — {ss.quiz_meta.get('difficulty','')}"
-subject = st.text_input("Subject", value=default_subject)
-body_prefill = ss.quiz_text or "Generate a quiz first, then come back here."
-body = st.text_area("Email body", value=body_prefill, height=260)
+subject = st.text_input("Subject", value=ss.default_subject)
+body = st.text_area("Email body", value=ss.body_prefill, height=260)
 confirm_send = st.checkbox("I confirm I want to send this email.")
-send_btn = st.button("📤 Send via Composio + LLM Tool Call")
-
-if send_btn:
+# One send at a time. Disabling the button isn't enough: a click made while the
+# button was still drawn enabled returns True on the next run, so guard the branch too
+send_in_flight = ss.send_future is not None and not ss.send_future.done()
+send_btn = st.button("📤 Send via Composio + LLM Tool Call", disabled=send_in_flight)
+
+if send_btn and send_in_flight:
+    st.warning("The previous email is still sending; wait for it to finish before sending again.")
+elif send_btn:
+    # A new attempt replaces the previous (finished) send's outcome, even if it submits nothing
+    ss.send_future = None
+    ss.send_diagnostics = {}
     if not ss.connected_account:
         st.error("Please complete Composio OAuth in the sidebar first.")
         st.stop()
@@ -255,47 +352,54 @@ if send_btn:
 
     # Get Gmail tool schema from Composio
     try:
-        tools = composio.tools.get(user_id=user_id, tools=["GMAIL_SEND_EMAIL"])
+        tools = ss.tools_cache.get(user_id)
+        if tools is None:
+            prefetch = ss.tools_future
+            if prefetch is not None and ss.tools_future_user == user_id:
+                # Consume the prefetch once; if it failed or stalled, fetch directly instead
+                ss.tools_future = None
+                try:
+                    tools = prefetch.result(timeout=10)
+                except Exception:
+                    tools = None
+            if tools is None:
+                tools = _get_gmail_tool(user_id)
+            if tools:
+                ss.tools_cache[user_id] = tools
         if not tools:
             st.error("No Gmail tool found. Ensure it's configured in Composio.")
             st.stop()
-        render_json("Composio Tools", tools)
+        if debug:
+            render_json("Composio Tools", tools)
     except Exception as e:
         st.error(f"Failed to fetch tools: {e}")
         st.stop()
 
     # Ask the LLM to use the tool to send email
-    system_msg = {
-        "role": "system",
-        "content": (
-            "You are a helpful assistant that MUST use the provided tools. "
-            "When asked to send an email, you MUST call the Gmail tool with the correct fields. "
-            "Do not respond with natural language; only produce the required tool calls."
-        ),
-    }
-    user_msg = {
-        "role": "user",
-        "content": (
-            f"Send an email to {to_email} with the subject '{subject}' and the body below.\n\n{body}"
-        ),
-    }
-
-    with st.spinner("Planning tool call with OpenAI..."):
+    system_msg, user_msg = email_tool_messages(to_email, subject, body)
+
+    with st.status("Planning tool call with OpenAI (retrying once on timeout)...") as plan_status:
         try:
-            resp = client.chat.completions.create(
+            resp = stream_completion(
+                st.empty(),
+                status=plan_status,
                 model="openai/gpt-5-chat-latest",
                 tools=tools,
                 tool_choice="auto",
                 messages=[system_msg, user_msg],
                 temperature=0,
             )
-            render_json("OpenAI Response", resp.model_dump() if hasattr(resp, "model_dump") else {"response": str(resp)})
+            n_calls = len(resp.choices[0].message.tool_calls or [])
+            plan_status.update(label=f"Planned {n_calls} tool call(s).", state="complete")
         except Exception as e:
+            plan_status.update(label="Planning failed.", state="error")
             st.error(f"OpenAI call failed: {e}")
             st.stop()
+    if debug:
+        render_json("OpenAI Response", resp.model_dump)
 
     # Execute tool calls via Composio
-    with st.spinner("Executing tool call via Composio..."):
+    with st.spinner("Handing tool call to Composio..."):
         try:
             # If the model didn't return any tool calls, attempt a fallback by
             # parsing the assistant message content as JSON with to/subject/body
@@ -309,10 +413,10 @@ if send_btn:
                 content_str = resp.choices[0].message.content or ""
                 fallback_payload = None
                 try:
-                    fallback_payload = json.loads(content_str)
+                    fallback_payload = orjson.loads(content_str)
                 except Exception:
                     try:
-                        fallback_payload = json.loads(extract_json_block(content_str))
+                        fallback_payload = orjson.loads(extract_json_block(content_str))
                     except Exception:
                         fallback_payload = None
 
@@ -320,7 +424,7 @@ if send_btn:
                     # Inspect the Gmail tool schema to determine required params
                     tool_schema = None
                     try:
-                        # tools is fetched above via composio.tools.get(...)
+                        # tools is fetched above via _get_gmail_tool(...)
                         # It can be a list or dict depending on SDK; normalize to list
                         tool_list = tools if isinstance(tools, list) else [tools]
                         for t in tool_list:
@@ -372,19 +476,19 @@ if send_btn:
                         arguments["body"] = arguments["message"]
 
                     if all(k in arguments and arguments[k] for k in ("recipient_email", "subject", "body")):
-                        try:
-                            result = composio.tools.execute(
-                                slug="GMAIL_SEND_EMAIL",
-                                arguments=arguments,
-                                user_id=user_id,
-                            )
-                            st.success("✅ Email sent (fallback path)!")
-                            render_json("Execution Result", result)
-                        except Exception as exec_err:
-                            st.error(f"Fallback execution failed: {exec_err}")
-                            render_json("Gmail Tool Arguments", arguments)
-                            render_json("Gmail Tool Schema", tool_schema or {"note": "schema unavailable"})
-                            render_json("Model Message", resp.choices[0].message.model_dump() if hasattr(resp.choices[0].message, "model_dump") else {"message": str(resp.choices[0].message)})
+                        ss.send_future = pool.submit(
+                            composio.tools.execute,
+                            slug="GMAIL_SEND_EMAIL",
+                            arguments=arguments,
+                            user_id=user_id,
+                        )
+                        ss.send_label = "Email sent (fallback path)!"
+                        ss.send_notified = False
+                        ss.send_diagnostics = {
+                            "Gmail Tool Arguments": arguments,
+                            "Gmail Tool Schema": tool_schema or {"note": "schema unavailable"},
+                            "Model Message": resp.choices[0].message.model_dump() if hasattr(resp.choices[0].message, "model_dump") else {"message": str(resp.choices[0].message)},
+                        }
                     else:
                         st.warning("Model returned no tool calls and content did not include required email fields.")
                         render_json("Needed Fields", {"required": ["recipient_email", "subject", "body"], "provided": list(fallback_payload.keys())})
@@ -393,10 +497,13 @@ if send_btn:
                     st.warning("Model returned no tool calls and content was not JSON.")
                     render_json("Model Message", resp.choices[0].message.model_dump() if hasattr(resp.choices[0].message, "model_dump") else {"message": str(resp.choices[0].message)})
             else:
-                result = composio.provider.handle_tool_calls(response=resp, user_id=user_id)
-                st.success("✅ Email sent!")
-                render_json("Execution Result", result)
+                ss.send_future = pool.submit(composio.provider.handle_tool_calls, response=resp, user_id=user_id)
+                ss.send_label = "Email sent!"
+                ss.send_notified = False
+                ss.send_diagnostics = {}
         except Exception as e:
             st.error(f"Tool execution failed: {e}")
 
+_send_status()
+
 ## Removed Section 3 (PDF + SMTP)
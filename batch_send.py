@@ -0,0 +1,118 @@
+"""Bulk Gmail sends planned through the OpenAI Batch API.
+
+Each queued email becomes one /v1/chat/completions request in a batch file.
+Batches cost half as much as synchronous calls but may take up to 24h, so this
+suits non-interactive bulk sends rather than the Streamlit Send button.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+import orjson
+from openai.types.chat import ChatCompletion
+
+from payloads import email_tool_messages
+
+_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+@dataclass
+class EmailJob:
+    """One queued email and the Composio user whose Gmail account sends it."""
+
+    user_id: str
+    to_email: str
+    subject: str
+    body: str
+
+
+def _batch_lines(jobs: Sequence[EmailJob], tools_by_user: Dict[str, object], model: str) -> List[bytes]:
+    """Encode one Batch API request line per job; custom_id is the job's index."""
+
+    lines: List[bytes] = []
+    for idx, job in enumerate(jobs):
+        lines.append(orjson.dumps({
+            "custom_id": f"job-{idx}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "tools": tools_by_user[job.user_id],
+                "tool_choice": "auto",
+                "temperature": 0,
+                "messages": email_tool_messages(job.to_email, job.subject, job.body),
+            },
+        }))
+    return lines
+
+
+def send_many(
+    client,
+    composio,
+    jobs: Sequence[EmailJob],
+    model: str = "openai/gpt-5-chat-latest",
+    poll_interval: float = 30.0,
+) -> Dict[str, object]:
+    """Plan Gmail tool calls for all `jobs` in one batch, then execute them via Composio.
+
+    Blocks until the batch reaches a terminal status and raises only if the batch
+    itself failed, expired or was cancelled. Returns a dict keyed by custom_id
+    ("job-<index>") holding either the Composio execution result or the exception
+    that job failed with.
+    """
+
+    if not jobs:
+        return {}
+
+    tools_by_user: Dict[str, object] = {}
+    for job in jobs:
+        if job.user_id not in tools_by_user:
+            tools_by_user[job.user_id] = composio.tools.get(user_id=job.user_id, tools=["GMAIL_SEND_EMAIL"])
+
+    batch_input = b"\n".join(_batch_lines(jobs, tools_by_user, model))
+    input_file = client.files.create(file=("email_jobs.jsonl", batch_input), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    while batch.status not in _TERMINAL_STATUSES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} ended with status {batch.status!r}.")
+
+    # Successful requests land in the output file; requests that failed (including
+    # validation errors) only appear in the error file, which may be the only one
+    results: Dict[str, object] = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for raw in client.files.content(file_id).text.splitlines():
+            if not raw.strip():
+                continue
+            line = orjson.loads(raw)
+            custom_id = line["custom_id"]
+            job = jobs[int(custom_id.split("-", 1)[1])]
+            response = line.get("response") or {}
+            if line.get("error") or response.get("status_code") != 200:
+                results[custom_id] = RuntimeError(f"Planning failed: {line.get('error') or response.get('body')}")
+                continue
+            try:
+                completion = ChatCompletion.model_validate(response["body"])
+                results[custom_id] = composio.provider.handle_tool_calls(response=completion, user_id=job.user_id)
+            except Exception as e:
+                results[custom_id] = e
+
+    for idx in range(len(jobs)):
+        results.setdefault(f"job-{idx}", RuntimeError("No result in batch output or error file."))
+    return results
+
+
+__all__ = [
+    "EmailJob",
+    "send_many",
+]
@@ -0,0 +1,101 @@
+"""Shared pieces of the Streamlit app: JSON helpers, formatting and clients.
+
+The quiz schema and prompt helpers live in payloads.py (no Streamlit import) and are
+re-exported here.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import orjson
+import streamlit as st
+from composio import Composio
+from openai import OpenAI
+
+# Re-exported so the app keeps importing everything from here
+from payloads import QUIZ_RESPONSE_FORMAT, Question, Quiz, email_tool_messages, extract_json_block
+
+
+def _json_default(obj):
+    """orjson hook: dump pydantic models (SDK objects) structurally, anything else as str."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return str(obj)
+
+
+def dumps_json(data) -> str:
+    """Pretty-print JSON with orjson, falling back to stdlib json for what orjson still rejects."""
+    try:
+        return orjson.dumps(
+            data, default=_json_default, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ).decode()
+    except TypeError:
+        return json.dumps(data, indent=2, default=str)
+
+
+@st.fragment
+def render_json(label, data, key=None):
+    """Show `data` as pretty JSON in a collapsed expander; strings are assumed pre-serialized.
+
+    Serialization only happens once the Show toggle is on. As a fragment, flipping
+    the toggle reruns just this expander, so payloads rendered inside a button
+    branch stay visible. `data` may also be a zero-argument callable (e.g.
+    `resp.model_dump`), so building a large payload is deferred too. The
+    toggle's widget key defaults to the label; pass `key` when the same label
+    can render more than once in a run.
+    """
+    with st.expander(label, expanded=False):
+        if st.toggle("Show", key=f"show_json_{key or label}"):
+            if callable(data):
+                data = data()
+            st.code(data if isinstance(data, str) else dumps_json(data), language="json")
+
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# One block per question; optional lines arrive pre-joined with their leading newline
+_QUESTION_FMT = "{num}. {question}{choices}{answer}{explanation}"
+
+
+def quiz_to_text(quiz_obj: dict) -> str:
+    """Render a quiz dict as plain text suitable for an email body."""
+    header = quiz_obj.get("title", "Quiz")
+    instructions = quiz_obj.get("instructions", "")
+    if instructions:
+        header = f"{header}\n{instructions}"
+
+    blocks = [header]
+    for num, q in enumerate(quiz_obj.get("questions", []), start=1):
+        choices = q.get("choices", [])
+        ci = q.get("correctIndex", None)
+        expl = q.get("explanation", "")
+        blocks.append(_QUESTION_FMT.format(
+            num=num,
+            question=q.get("question", ""),
+            choices="".join(f"\n   {LETTERS[i]}. {c}" for i, c in enumerate(choices)),
+            answer=f"\n   ✅ Answer: {LETTERS[ci]}" if isinstance(ci, int) and 0 <= ci < len(choices) else "",
+            explanation=f"\n   ℹ️  {expl}" if expl else "",
+        ))
+    return "\n\n".join(blocks) + "\n"
+
+
+@st.cache_resource
+def get_clients():
+    """Build the OpenAI and Composio clients plus a background pool once per server process."""
+    try:
+        openai_key = st.secrets["OPENAI_API_KEY"]
+        composio_key = st.secrets["COMPOSIO_API_KEY"]
+    except KeyError as e:
+        st.error(f"Missing secret: {e}. Add it to .streamlit/secrets.toml and restart.")
+        st.stop()
+    # Bound stalled upstream calls; the SDK retries once with exponential backoff
+    timeout = float(st.secrets.get("OPENAI_TIMEOUT", 20.0))
+    openai_client = OpenAI(
+        base_url="https://api.aimlapi.com/v1",
+        api_key=openai_key,
+        timeout=httpx.Timeout(timeout, connect=5.0),
+        max_retries=1,
+    )
+    # Shared pool for background network I/O (e.g. prefetching tool schemas)
+    return openai_client, Composio(api_key=composio_key), ThreadPoolExecutor(max_workers=2)
@@ -0,0 +1,70 @@
+"""Quiz schema, JSON extraction and Gmail prompts shared by the app and batch jobs.
+
+Kept free of Streamlit so non-interactive senders (batch_send.py) can import it
+without loading the UI stack.
+"""
+
+import re
+from typing import List
+
+from pydantic import BaseModel, ConfigDict
+
+
+class Question(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    question: str
+    choices: List[str]
+    correctIndex: int
+    explanation: str
+
+
+class Quiz(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    title: str
+    instructions: str
+    questions: List[Question]
+
+
+# Strict structured output: the server only emits objects matching the Quiz schema
+QUIZ_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "quiz", "strict": True, "schema": Quiz.model_json_schema()},
+}
+
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$", re.S)
+
+
+def extract_json_block(text: str) -> str:
+    """Strip code fences and return the substring between the first '{' and last '}'."""
+    if not text:
+        raise ValueError("Empty model output.")
+    cleaned = text.strip()
+    if cleaned.startswith("`"):
+        cleaned = _FENCE_RE.sub("", cleaned)
+    start = cleaned.find("{")
+    end = cleaned.rfind("}")
+    if start == -1 or end == -1 or end <= start:
+        raise ValueError("Could not find JSON object in the output.")
+    return cleaned[start:end+1]
+
+
+def email_tool_messages(to_email: str, subject: str, body: str) -> List[dict]:
+    """Chat messages asking the model to send one email via the Gmail tool."""
+    system_msg = {
+        "role": "system",
+        "content": (
+            "You are a helpful assistant that MUST use the provided tools. "
+            "When asked to send an email, you MUST call the Gmail tool with the correct fields. "
+            "Do not respond with natural language; only produce the required tool calls."
+        ),
+    }
+    user_msg = {
+        "role": "user",
+        "content": (
+            f"Send an email to {to_email} with the subject '{subject}' and the body below.\n\n{body}"
+        ),
+    }
+    return [system_msg, user_msg]
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import multiprocessing
+import os
 import random
 import re
 import smtplib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, contextmanager, suppress
 from dataclasses import dataclass
 from email.message import EmailMessage
+from functools import lru_cache
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Optional, Sequence, Tuple
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-import nltk
-from PyPDF2 import PdfReader
+# nltk and pypdfium2 are imported inside the functions that use them so that
+# `cli.py --help` and argument errors don't pay their import cost.
 
 
 @dataclass
@@ -23,94 +30,250 @@ class SMTPConfig:
     use_tls: bool = True
 
 
+@dataclass
+class QuizEmailJob:
+    """One quiz to generate from `pdf_path` and email to `to_email`."""
+
+    pdf_path: str | Path
+    to_email: str
+    subject: str
+    num_questions: int = 5
+    seed: Optional[int] = None
+
+
+_NLTK_READY = False
+
+_WORD_RE = re.compile(r"\w+")
+_NOUN_TOKEN_RE = re.compile(r"^[A-Za-z][A-Za-z\-]+$")
+_FALLBACK_WORD_RE = re.compile(r"[A-Za-z][A-Za-z\-]{3,}")
+
+# Option labels for multiple-choice answers
+LABELS = ("A", "B", "C", "D", "E", "F")
+
+
+# (resource path, download id) that nltk==3.9.1 loads: sent_tokenize/word_tokenize
+# read punkt_tab, pos_tag reads the JSON English perceptron tagger
+_NLTK_RESOURCES = (
+    ("tokenizers/punkt_tab", "punkt_tab"),
+    ("taggers/averaged_perceptron_tagger_eng", "averaged_perceptron_tagger_eng"),
+)
+
+
 def _ensure_nltk_models() -> None:
     """Ensure required NLTK models are available at runtime.
 
-    This downloads models only if missing to avoid repeated network calls.
+    This downloads models only if missing to avoid repeated network calls, and
+    remembers success so later calls skip the resource lookups entirely. A
+    failed download (nltk.download returns False rather than raising) leaves
+    the flag unset so the next call retries.
     """
 
-    try:
-        nltk.data.find("tokenizers/punkt")
-    except LookupError:
-        nltk.download("punkt")
+    global _NLTK_READY
+    if _NLTK_READY:
+        return
 
-    # Newer NLTK uses 'punkt_tab' alongside 'punkt'
-    try:
-        nltk.data.find("tokenizers/punkt_tab")
-    except LookupError:
+    import nltk
+
+    ready = True
+    for resource, package in _NLTK_RESOURCES:
         try:
-            nltk.download("punkt_tab")
-        except Exception:
-            # Some versions may not provide punkt_tab; safe to ignore
-            pass
+            nltk.data.find(resource)
+        except LookupError:
+            ready = nltk.download(package) and ready
 
-    try:
-        nltk.data.find("taggers/averaged_perceptron_tagger")
-    except LookupError:
-        nltk.download("averaged_perceptron_tagger")
+    _NLTK_READY = bool(ready)
+
+
+_PdfSource = Union[str, Path, bytes, bytearray, memoryview, BinaryIO]
 
 
-def _read_pdf_text(pdf_path: str | Path) -> str:
-    """Extract text content from a PDF file."""
+def _extract_page_text(pdf, index: int) -> str:
+    """Extract one page's text with PDFium; unreadable pages yield an empty string."""
 
-    reader = PdfReader(str(pdf_path))
-    pages_text: List[str] = []
-    for page in reader.pages:
+    try:
+        page = pdf[index]
         try:
-            text = page.extract_text() or ""
-        except Exception:
-            text = ""
-        pages_text.append(text)
-    raw_text = "\n".join(pages_text)
+            textpage = page.get_textpage()
+            try:
+                return textpage.get_text_bounded() or ""
+            finally:
+                textpage.close()
+        finally:
+            page.close()
+    except Exception:
+        return ""
+
+
+# Below this many pages, spawning worker processes (~0.5s of interpreter start-up
+# and imports) costs more than it saves
+_PARALLEL_MIN_PAGES = 200
+# Pages per worker task: large enough to amortize reopening the document
+_PAGES_PER_TASK = 16
 
-    # Basic cleanup
-    cleaned = re.sub(r"\s+", " ", raw_text)
-    return cleaned.strip()
 
+def _extract_page_range(path_str: str, start: int, stop: int) -> List[str]:
+    """Worker: open the PDF independently and return cleaned text for pages [start, stop)."""
 
-def _select_candidate_sentences(text: str) -> List[str]:
-    """Split text to sentences and keep reasonably informative ones."""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path_str)
+    try:
+        # Basic cleanup per page: collapse whitespace runs (str.split is C-level)
+        return [" ".join(_extract_page_text(pdf, index).split()) for index in range(start, stop)]
+    finally:
+        pdf.close()
+
+
+def _iter_pdf_pages(source: _PdfSource, parallel: bool = False) -> Iterator[str]:
+    """Yield the cleaned, non-empty text of each page of a PDF path, bytes, or binary file object.
+
+    Pages are produced lazily so a consumer that has seen enough text can stop
+    (close the generator) without extracting the rest. With `parallel`, meant
+    for reads of the whole document, large on-disk PDFs are split into page
+    ranges extracted in worker processes (PDFium is not thread-safe, so each
+    process opens its own copy); page order is preserved.
+    """
+
+    import pypdfium2 as pdfium
+
+    if isinstance(source, (bytearray, memoryview)):
+        source = bytes(source)
+    elif isinstance(source, Path):
+        source = str(source)
+    pdf = pdfium.PdfDocument(source)
+    try:
+        n_pages = len(pdf)
+        workers = min(8, os.cpu_count() or 1)
+        if parallel and isinstance(source, str) and workers > 1 and n_pages >= _PARALLEL_MIN_PAGES:
+            step = min(-(-n_pages // workers), _PAGES_PER_TASK)
+            starts = iter(range(0, n_pages, step))
+            # spawn, not Linux's default fork: forking a multi-threaded host (e.g. the
+            # Streamlit server) can deadlock the children
+            mp_context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+
+                def submit(start: int):
+                    return pool.submit(_extract_page_range, source, start, min(start + step, n_pages))
+
+                try:
+                    # Keep a bounded window of ranges in flight instead of queueing them all
+                    window = deque(submit(start) for start in islice(starts, 2 * workers))
+                    while window:
+                        chunk = window.popleft().result()
+                        start = next(starts, None)
+                        if start is not None:
+                            window.append(submit(start))
+                        yield from (text for text in chunk if text)
+                finally:
+                    # On early stop, drop the ranges no worker has started yet
+                    pool.shutdown(cancel_futures=True)
+        else:
+            for index in range(n_pages):
+                text = " ".join(_extract_page_text(pdf, index).split())
+                if text:
+                    yield text
+    finally:
+        pdf.close()
+
+
+def _iter_sentences(pages: Iterable[str]) -> Iterator[str]:
+    """Split text chunks into stripped sentences, one chunk at a time."""
+
+    import nltk
 
     _ensure_nltk_models()
-    sent_tokenize = getattr(nltk, "sent_tokenize", None)
-    if sent_tokenize is None:
-        from nltk.tokenize import sent_tokenize  # type: ignore
+    for page in pages:
+        for sentence in nltk.sent_tokenize(page):
+            sentence = sentence.strip()
+            if sentence:
+                yield sentence
+
 
-    sentences = nltk.sent_tokenize(text)
-    filtered: List[str] = []
-    for sentence in sentences:
-        words = re.findall(r"\w+", sentence)
-        if 8 <= len(words) <= 35 and not sentence.strip().endswith(":"):
-            filtered.append(sentence.strip())
-    return filtered
+@lru_cache(maxsize=1)
+def _spacy_nlp():
+    """Load spaCy's small English pipeline for tagging, or None when it isn't installed.
+
+    Only the tokenizer and tagger run; the Penn Treebank `tag_` it produces uses
+    the same NN* noun tags as NLTK's perceptron tagger.
+    """
+
+    try:
+        import spacy
 
+        return spacy.load("en_core_web_sm", disable=["parser", "attribute_ruler", "lemmatizer", "ner"])
+    except (ImportError, OSError):
+        return None
 
-def _collect_nouns(text: str) -> List[str]:
-    """Return a list of unique nouns from text (basic POS tagging)."""
+
+def _analyze(
+    sentences: Iterable[str], limit: Optional[int] = None
+) -> Tuple[List[Tuple[str, List[str]]], List[str]]:
+    """Tokenize and POS-tag a stream of sentences in a single pass.
+
+    Returns (candidates, doc_nouns): candidates are the reasonably informative
+    sentences paired with their nouns; doc_nouns are the unique nouns seen, in
+    order of first appearance (the distractor pool). With `limit`, stops pulling
+    sentences once that many candidates contain a pool-worthy noun.
+
+    Tagging uses spaCy (batched through `nlp.pipe`) when `en_core_web_sm` is
+    available, and NLTK's perceptron tagger otherwise.
+    """
+
+    import nltk
 
     _ensure_nltk_models()
-    words = nltk.word_tokenize(text)
-    tagged = nltk.pos_tag(words)
-    nouns = [w for w, t in tagged if t.startswith("NN") and re.match(r"^[A-Za-z][A-Za-z\-]+$", w)]
-    # Normalize and deduplicate while preserving order
+    nlp = _spacy_nlp()
+    if nlp is not None:
+        tagged_sentences = (
+            (sentence, [(tok.text, tok.tag_) for tok in doc])
+            for doc, sentence in nlp.pipe(((s, s) for s in sentences), as_tuples=True, batch_size=64)
+        )
+    else:
+        tagged_sentences = ((s, nltk.pos_tag(nltk.word_tokenize(s))) for s in sentences)
+
+    candidates: List[Tuple[str, List[str]]] = []
+    doc_nouns: List[str] = []
     seen = set()
-    unique_nouns: List[str] = []
-    for noun in nouns:
-        base = noun.strip().strip(".,;:!?()[]{}'\"")
-        if not base:
-            continue
-        key = base.lower()
-        if key not in seen and len(base) > 2:
-            seen.add(key)
-            unique_nouns.append(base)
-    return unique_nouns
+    # Hot loop: bind globals and bound methods to locals (LOAD_FAST instead of dict lookups)
+    findall = _WORD_RE.findall
+    is_noun_token = _NOUN_TOKEN_RE.match
+    add_seen = seen.add
+    add_noun = doc_nouns.append
+    add_candidate = candidates.append
+    n_usable = 0
+    for sentence, tagged in tagged_sentences:
+        sentence_nouns = [w for w, t in tagged if t[:2] == "NN"]
+
+        # Normalize and deduplicate document nouns while preserving order
+        in_pool = False
+        for noun in sentence_nouns:
+            if len(noun) > 2 and is_noun_token(noun):
+                in_pool = True
+                key = noun.lower()
+                if key not in seen:
+                    add_seen(key)
+                    add_noun(noun)
+
+        if 8 <= len(findall(sentence)) <= 35 and not sentence.endswith(":"):
+            add_candidate((sentence, sentence_nouns))
+            if in_pool:
+                n_usable += 1
+                if limit is not None and n_usable >= limit:
+                    break
+    return candidates, doc_nouns
+
+
+@lru_cache(maxsize=1024)
+def _mask_re(target: str) -> re.Pattern:
+    """Compiled whole-word, case-insensitive pattern for `target` (targets repeat within a document)."""
+
+    return re.compile(rf"\b{re.escape(target)}\b", re.IGNORECASE)
 
 
 def _mask_target_in_sentence(sentence: str, target: str) -> str:
     """Replace the first case-insensitive occurrence of target with a blank."""
 
-    pattern = re.compile(rf"\b{re.escape(target)}\b", re.IGNORECASE)
-    return pattern.sub("_____", sentence, count=1)
+    return _mask_re(target).sub("_____", sentence, count=1)
 
 
 def _build_mcq(
@@ -121,10 +284,20 @@ def _build_mcq(
     Returns (question_text, options, correct_option)
     """
 
-    # Distractors: choose 3 distinct nouns not equal to the target
-    distractors_pool = [n for n in noun_pool if n.lower() != target.lower() and n.lower() != target.lower() + "s"]
-    distractors = rng.sample(distractors_pool, k=min(3, len(distractors_pool)))
-    all_options = distractors + [target]
+    # Distractors: choose 3 distinct nouns not equal to the target. Drawing indices
+    # avoids copying the pool; two spare draws cover the target and its plural,
+    # which appear at most once each in a deduplicated pool
+    target_lower = target.lower()
+    excluded = (target_lower, target_lower + "s")
+    n_pool = len(noun_pool)
+    all_options = [
+        noun_pool[i] for i in rng.sample(range(n_pool), k=min(5, n_pool)) if noun_pool[i].lower() not in excluded
+    ][:3]
+    if len(all_options) < 3 and n_pool > 5:
+        # Rare (case-variant duplicates in a fallback pool): filter, then sample
+        distractors_pool = [n for n in noun_pool if n.lower() not in excluded]
+        all_options = rng.sample(distractors_pool, k=min(3, len(distractors_pool)))
+    all_options.append(target)
     rng.shuffle(all_options)
     question_text = _mask_target_in_sentence(sentence, target)
     return question_text, all_options, target
@@ -133,25 +306,73 @@ def _build_mcq(
 def _format_quiz(qa_items: List[Tuple[str, List[str], str]]) -> str:
     """Format quiz as a plain-text email-friendly body."""
 
-    lines: List[str] = []
-    lines.append("Quiz")
-    lines.append("")
-    for idx, (question, options, correct) in enumerate(qa_items, start=1):
-        lines.append(f"Q{idx}. {question}")
-        option_labels = ["A", "B", "C", "D", "E", "F"]
-        for opt_idx, option in enumerate(options):
-            label = option_labels[opt_idx] if opt_idx < len(option_labels) else f"{opt_idx+1}"
-            lines.append(f"   {label}) {option}")
-        lines.append("")
-    lines.append("Answer Key")
+    body: List[str] = ["Quiz", ""]
+    key: List[str] = []
+    n_labels = len(LABELS)
     for idx, (question, options, correct) in enumerate(qa_items, start=1):
+        body.append(f"Q{idx}. {question}")
+        body.append(
+            "\n".join(
+                f"   {LABELS[opt_idx] if opt_idx < n_labels else opt_idx + 1}) {option}"
+                for opt_idx, option in enumerate(options)
+            )
+        )
+        body.append("")
         try:
             correct_index = options.index(correct)
         except ValueError:
             correct_index = 0
-        label = ["A", "B", "C", "D", "E", "F"][correct_index]
-        lines.append(f"Q{idx}: {label}")
-    return "\n".join(lines)
+        key.append(f"Q{idx}: {LABELS[correct_index]}")
+    return "\n".join(body + ["Answer Key"] + key)
+
+
+# (usable sentences with their in-pool nouns, document noun pool)
+_DocArtifacts = Tuple[Tuple[Tuple[str, List[str]], ...], Tuple[str, ...]]
+
+
+def _sentence_limit(num_questions: int) -> int:
+    """How many usable sentences to analyze before a quiz has enough to sample from."""
+
+    return max(num_questions * 3, 50)
+
+
+def _doc_artifacts(sentences: Iterable[str], limit: Optional[int] = None) -> _DocArtifacts:
+    """Run the NLP passes a quiz needs over `sentences`; the result is reusable across quizzes."""
+
+    candidates, nouns = _analyze(sentences, limit)
+    if not candidates:
+        raise ValueError("Could not find suitable sentences in the PDF to generate questions.")
+
+    if not nouns:
+        # Fallback: pick mid-length words as pseudo-nouns
+        words = _FALLBACK_WORD_RE.findall(" ".join(sentence for sentence, _ in candidates))
+        nouns = list(dict.fromkeys(words))
+
+    # Keep only sentences with at least one noun from the pool, so sampling never rejects
+    nouns_lower = {n.lower() for n in nouns}
+    usable = []
+    for sentence, sentence_nouns in candidates:
+        sentence_nouns = [n for n in sentence_nouns if n.lower() in nouns_lower]
+        if sentence_nouns:
+            usable.append((sentence, sentence_nouns))
+    return tuple(usable), tuple(nouns)
+
+
+def _pdf_source_artifacts(source: _PdfSource, limit: Optional[int]) -> _DocArtifacts:
+    """Stream a PDF's pages into analysis, stopping extraction once `limit` sentences are usable."""
+
+    with closing(_iter_pdf_pages(source)) as pages:
+        first = next(pages, None)
+        if first is None:
+            raise ValueError("No text could be extracted from the PDF.")
+        return _doc_artifacts(_iter_sentences(chain((first,), pages)), limit)
+
+
+@lru_cache(maxsize=8)
+def _pdf_artifacts(path_str: str, mtime_ns: int, size: int, limit: Optional[int]) -> _DocArtifacts:
+    """Extract and analyze a PDF once per (path, mtime, size, limit); edits to the file miss the cache."""
+
+    return _pdf_source_artifacts(path_str, limit)
 
 
 def generate_quiz_from_pdf(
@@ -166,48 +387,62 @@ def generate_quiz_from_pdf(
     - Masks a noun in each selected sentence to form a blank
     - Builds MCQs with distractors sampled from other nouns in the document
 
+    Pages are extracted and analyzed only until there are enough usable
+    sentences for `num_questions`, so large documents stop early. Results are
+    cached per file, so repeated quizzes from an unchanged PDF (e.g. other seeds)
+    skip straight to sampling.
+
     Returns a formatted quiz body suitable for email.
     """
 
-    rng = random.Random(seed)
-    text = _read_pdf_text(pdf_path)
-    if not text:
-        raise ValueError("No text could be extracted from the PDF.")
+    stat = os.stat(pdf_path)
+    artifacts = _pdf_artifacts(
+        os.path.abspath(pdf_path), stat.st_mtime_ns, stat.st_size, _sentence_limit(num_questions)
+    )
+    return _quiz_from_artifacts(artifacts, num_questions=num_questions, seed=seed)
 
-    candidate_sentences = _select_candidate_sentences(text)
-    if not candidate_sentences:
-        raise ValueError("Could not find suitable sentences in the PDF to generate questions.")
 
-    nouns = _collect_nouns(text)
-    if not nouns:
-        # Fallback: pick mid-length words as pseudo-nouns
-        words = [w for w in re.findall(r"[A-Za-z][A-Za-z\-]{3,}", text)]
-        nouns = list(dict.fromkeys(words))
+def extract_pdf_text(source: _PdfSource) -> str:
+    """Extract the full text of a PDF path, in-memory bytes, or binary file object.
 
-    # Prefer sentences that actually contain nouns
-    chosen: List[Tuple[str, List[str], str]] = []
-    seen_sentence_indexes = set()
-    attempts = 0
-    max_attempts = max(num_questions * 6, 30)
-    while len(chosen) < num_questions and attempts < max_attempts:
-        attempts += 1
-        if not candidate_sentences:
-            break
-        idx = rng.randrange(0, len(candidate_sentences))
-        if idx in seen_sentence_indexes:
-            continue
-        seen_sentence_indexes.add(idx)
-        sentence = candidate_sentences[idx]
+    Pair with `generate_quiz_from_text` to parse a document once and build
+    several quizzes from it, e.g. from an upload buffer without a temp file.
+    """
 
-        # Identify nouns present in the sentence
-        sentence_tokens = nltk.word_tokenize(sentence)
-        sentence_tags = nltk.pos_tag(sentence_tokens)
-        sentence_nouns = [w for w, t in sentence_tags if t.startswith("NN")]
-        # Filter nouns to those appearing in the global pool
-        sentence_nouns = [n for n in sentence_nouns if any(n.lower() == g.lower() for g in nouns)]
+    return " ".join(_iter_pdf_pages(source, parallel=True))
 
-        if not sentence_nouns:
-            continue
+
+def generate_quiz_from_text(
+    text: str,
+    num_questions: int = 5,
+    seed: Optional[int] = None,
+) -> str:
+    """Generate a multiple-choice quiz from already-extracted document text.
+
+    Lets callers extract (and cache) PDF text once with `extract_pdf_text` and
+    build several quizzes from it without re-parsing the PDF.
+    """
+
+    artifacts = _doc_artifacts(_iter_sentences((text,)), _sentence_limit(num_questions))
+    return _quiz_from_artifacts(artifacts, num_questions=num_questions, seed=seed)
+
+
+def _quiz_from_artifacts(
+    artifacts: _DocArtifacts,
+    num_questions: int,
+    seed: Optional[int],
+) -> str:
+    """Sample sentences from analyzed document artifacts and format the quiz."""
+
+    rng = random.Random(seed)
+    candidates, nouns = artifacts
+
+    # Visit usable sentences once each, in random order, until enough questions are built
+    chosen: List[Tuple[str, List[str], str]] = []
+    for idx in rng.sample(range(len(candidates)), k=len(candidates)):
+        if len(chosen) >= num_questions:
+            break
+        sentence, sentence_nouns = candidates[idx]
 
         target = rng.choice(sentence_nouns)
         question_text, options, correct = _build_mcq(sentence, target, nouns, rng)
@@ -243,6 +478,52 @@ def generate_quiz_from_pdf(
     return _format_quiz(chosen)
 
 
+def _smtp_connect(smtp_config: SMTPConfig) -> smtplib.SMTP:
+    """Open an SMTP connection and log in; the caller owns (and must close) it."""
+
+    if smtp_config.use_tls:
+        server = smtplib.SMTP(smtp_config.host, smtp_config.port)
+        server.starttls()
+    else:
+        server = smtplib.SMTP_SSL(smtp_config.host, smtp_config.port)
+    try:
+        server.login(smtp_config.username, smtp_config.password)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def _smtp_close(server: smtplib.SMTP) -> None:
+    """QUIT politely, then close the socket even if the link has already dropped."""
+
+    with suppress(smtplib.SMTPException, OSError):
+        server.quit()
+    server.close()
+
+
+@contextmanager
+def _smtp_session(smtp_config: SMTPConfig) -> Iterator[smtplib.SMTP]:
+    """Yield a logged-in SMTP connection and QUIT it afterwards, ignoring a dropped link."""
+
+    server = _smtp_connect(smtp_config)
+    try:
+        yield server
+    finally:
+        _smtp_close(server)
+
+
+def _quiz_message(quiz_body: str, to_email: str, subject: str, smtp_config: SMTPConfig) -> EmailMessage:
+    """Wrap a quiz body in a plain-text email from the SMTP account."""
+
+    message = EmailMessage()
+    message["From"] = smtp_config.username
+    message["To"] = to_email
+    message["Subject"] = subject
+    message.set_content(quiz_body)
+    return message
+
+
 def agent_mode_send_quiz(
     pdf_path: str | Path,
     to_email: str,
@@ -250,34 +531,87 @@ def agent_mode_send_quiz(
     smtp_config: SMTPConfig,
     num_questions: int = 5,
     seed: Optional[int] = None,
+    server: Optional[smtplib.SMTP] = None,
 ) -> None:
     """Generate a quiz from `pdf_path` and email it to `to_email` with `subject`.
 
-    The email body is the generated quiz. Uses the given SMTP settings.
+    The email body is the generated quiz. Uses the given SMTP settings. Pass a
+    logged-in `server` (see `_smtp_connect`) to reuse one connection across sends;
+    if it has dropped, the message is sent once over a fresh connection instead.
     """
 
     quiz_body = generate_quiz_from_pdf(pdf_path=pdf_path, num_questions=num_questions, seed=seed)
+    message = _quiz_message(quiz_body, to_email, subject, smtp_config)
 
-    message = EmailMessage()
-    message["From"] = smtp_config.username
-    message["To"] = to_email
-    message["Subject"] = subject
-    message.set_content(quiz_body)
-
-    if smtp_config.use_tls:
-        with smtplib.SMTP(smtp_config.host, smtp_config.port) as server:
-            server.starttls()
-            server.login(smtp_config.username, smtp_config.password)
-            server.send_message(message)
-    else:
-        with smtplib.SMTP_SSL(smtp_config.host, smtp_config.port) as server:
-            server.login(smtp_config.username, smtp_config.password)
+    if server is not None:
+        try:
             server.send_message(message)
+            return
+        except smtplib.SMTPServerDisconnected:
+            pass
+
+    with _smtp_session(smtp_config) as fresh:
+        fresh.send_message(message)
+
+
+def _smtp_alive(server: smtplib.SMTP) -> bool:
+    """NOOP the connection; replies such as 421 "service closing" come back rather than raise."""
+
+    try:
+        return server.noop()[0] == 250
+    except smtplib.SMTPServerDisconnected:
+        return False
+
+
+def send_quizzes(jobs: Iterable[QuizEmailJob], smtp_config: SMTPConfig) -> Dict[int, Optional[Exception]]:
+    """Generate and email several quizzes over a single SMTP connection.
+
+    Only one TLS handshake and login is paid for the whole batch, and the
+    connection opens only once the first quiz is built, so slow PDF/NLTK work
+    doesn't leave it idle. Before each later send a NOOP checks the link; if the
+    server has dropped it or answers anything but 250, the sender reconnects.
+
+    Returns {job index: None if sent, else the exception that job failed with};
+    one bad job (e.g. a missing PDF) doesn't stop the rest.
+    """
+
+    results: Dict[int, Optional[Exception]] = {}
+    server: Optional[smtplib.SMTP] = None
+    try:
+        for idx, job in enumerate(jobs):
+            try:
+                quiz_body = generate_quiz_from_pdf(pdf_path=job.pdf_path, num_questions=job.num_questions, seed=job.seed)
+                message = _quiz_message(quiz_body, job.to_email, job.subject, smtp_config)
+                if server is not None and not _smtp_alive(server):
+                    server.close()
+                    server = None
+                if server is None:
+                    server = _smtp_connect(smtp_config)
+                try:
+                    server.send_message(message)
+                except smtplib.SMTPServerDisconnected:
+                    # Dropped between the NOOP and the send; reconnect once
+                    server.close()
+                    server = None
+                    server = _smtp_connect(smtp_config)
+                    server.send_message(message)
+            except Exception as e:
+                results[idx] = e
+            else:
+                results[idx] = None
+    finally:
+        if server is not None:
+            _smtp_close(server)
+    return results
 
 
 __all__ = [
     "SMTPConfig",
+    "QuizEmailJob",
     "generate_quiz_from_pdf",
+    "extract_pdf_text",
+    "generate_quiz_from_text",
     "agent_mode_send_quiz",
+    "send_quizzes",
 ]
 